@@ -0,0 +1,63 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""C implementation of the hot frame-head encode for handler.py.
+
+Optional: build in place with ``cythonize -i _cencode.pyx``; handler.py
+falls back to its pure-Python writer when this module is absent, so the
+extension never needs to be part of the image build.
+"""
+
+
+cdef inline void _write_json_str(bytearray out, str s):
+    """Append ``s`` as a JSON string literal, escaping only when needed."""
+    cdef bytes raw = s.encode('utf-8')
+    cdef const unsigned char* p = raw
+    cdef Py_ssize_t n = len(raw)
+    cdef Py_ssize_t i, start = 0
+    cdef unsigned char c
+    out += b'"'
+    for i in range(n):
+        c = p[i]
+        if c == 34 or c == 92 or c < 32:
+            if i > start:
+                out += raw[start:i]
+            if c == 34:
+                out += b'\\"'
+            elif c == 92:
+                out += b'\\\\'
+            elif c == 10:
+                out += b'\\n'
+            elif c == 13:
+                out += b'\\r'
+            elif c == 9:
+                out += b'\\t'
+            else:
+                out += ('\\u%04x' % c).encode('ascii')
+            start = i + 1
+    if start == 0:
+        out += raw
+    elif start < n:
+        out += raw[start:n]
+    out += b'"'
+
+
+cpdef bytes encode_head(str timestamp, str level, str service, str logger,
+                        str message):
+    """Serialize the fixed leading fields of one log frame.
+
+    Returns the frame up to (but not including) the context object and the
+    closing brace; the caller appends those. ``timestamp`` and ``level``
+    are known-ASCII and written raw, the free-form strings go through the
+    escaping writer.
+    """
+    cdef bytearray out = bytearray()
+    out += b'{"timestamp":"'
+    out += timestamp.encode('ascii')
+    out += b'","level":"'
+    out += level.encode('ascii')
+    out += b'","service":'
+    _write_json_str(out, service)
+    out += b',"logger":'
+    _write_json_str(out, logger)
+    out += b',"message":'
+    _write_json_str(out, message)
+    return bytes(out)
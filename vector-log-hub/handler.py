@@ -0,0 +1,791 @@
+"""Python logging handler that ships structured JSON logs to a Vector TCP source.
+
+Counterpart of the Rust side's ``tracing_vector`` layer: microservices that are
+not built on the Rust SDK attach a :class:`VectorHandler` (usually via
+:func:`setup_logging`) and emit newline-delimited JSON events to the Vector
+socket source configured in docker-compose (``VECTOR_LOG_ENDPOINT``).
+
+The handler keeps the application threads cheap: ``emit`` only pushes the raw
+record onto a bounded queue. All handlers targeting the same endpoint share
+one :class:`_Pipe` — a socket plus a single daemon worker that drains the
+queue in batches, JSON-encodes the records and writes them to a non-blocking
+socket with one gathered write per batch.
+"""
+
+import collections
+import errno
+import json
+import keyword
+import logging
+import os
+import random
+import re
+import selectors
+import socket
+import sys
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 8192
+DEFAULT_BATCH_MAX = 128
+DEFAULT_FLUSH_INTERVAL_MS = 5
+
+_BACKOFF_INITIAL = 0.05
+_BACKOFF_MAX = 5.0
+_STALL_TIMEOUT = 5.0
+_FLUSH_TIMEOUT = 10.0
+_ERROR_REPORT_INTERVAL = 5.0
+_SPILL_MAX_BYTES = 16 * 1024 * 1024
+_BUFPOOL_MAX = 64
+_CODEGEN_THRESHOLD = 8
+_CODEGEN_MAX = 16
+_KEYSET_COUNTS_MAX = 256
+_SNDBUF_BYTES = 4 * 1024 * 1024
+
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+# sendmsg rejects iovecs longer than IOV_MAX with EMSGSIZE, so gathered
+# writes are sliced to this many frames per call.
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, OSError, ValueError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+_LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# Standard LogRecord attributes; anything else on the record came in via
+# ``extra=`` and belongs in the context payload.
+_STD_ATTRS = frozenset((
+    'name', 'msg', 'args', 'levelname', 'levelno', 'pathname', 'filename',
+    'module', 'lineno', 'funcName', 'created', 'msecs', 'relativeCreated',
+    'thread', 'threadName', 'processName', 'process', 'exc_info', 'exc_text',
+    'stack_info', 'message', 'taskName',
+))
+
+# Control keys understood by the handler itself; never shipped as context.
+_SKIP_ATTRS = _STD_ATTRS | {'sample_rate'}
+
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, default=str)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+# Strings that can be emitted between quotes without an escape pass; JSON
+# only requires escaping for '"', '\\' and control characters, anything
+# else (including non-ASCII) goes out as raw UTF-8.
+_SAFE_RE = re.compile(r'[^"\\\x00-\x1f]*\Z')
+
+
+def _write_str(buf, s):
+    if _SAFE_RE.match(s):
+        buf += b'"'
+        buf += s.encode('utf-8')
+        buf += b'"'
+    else:
+        buf += json.dumps(s, ensure_ascii=False).encode('utf-8')
+
+
+_MISSING = object()
+
+
+def _specialize_context_writer(extra_keys, guarded=False):
+    """Generate a context writer with the given keys inlined.
+
+    The emitted function appends the ``context`` object for a record:
+    straight-line attribute reads with the JSON key fragments baked in as
+    byte literals, no __dict__ iteration and no set membership tests. With
+    ``guarded=False`` the record is known to carry exactly ``extra_keys``;
+    with ``guarded=True`` each read goes through a defaulted getattr and
+    absent fields are skipped.
+    """
+    src = ['def _write_ctx(record, buf):']
+    if extra_keys and not guarded:
+        lead = b',"context":{'
+        for key in extra_keys:
+            frag = lead + json.dumps(key).encode('utf-8') + b':'
+            src.append(f'    buf += {frag!r}')
+            src.append(f'    v = record.{key}')
+            src.append('    if type(v) is str:')
+            src.append('        _write_str(buf, v)')
+            src.append('    else:')
+            src.append('        buf += _dumps(v)')
+            lead = b','
+        src.append("    buf += b'}'")
+    elif extra_keys:
+        src.append("    lead = b',\"context\":{'")
+        for key in extra_keys:
+            frag = json.dumps(key).encode('utf-8') + b':'
+            src.append(f'    v = getattr(record, {key!r}, _MISSING)')
+            src.append('    if v is not _MISSING:')
+            src.append('        buf += lead')
+            src.append(f'        buf += {frag!r}')
+            src.append('        if type(v) is str:')
+            src.append('            _write_str(buf, v)')
+            src.append('        else:')
+            src.append('            buf += _dumps(v)')
+            src.append("        lead = b','")
+        src.append("    if lead == b',':")
+        src.append("        buf += b'}'")
+    else:
+        src.append('    pass')
+    namespace = {'_write_str': _write_str, '_dumps': _dumps,
+                 '_MISSING': _MISSING}
+    exec('\n'.join(src), namespace)
+    return namespace['_write_ctx']
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+try:
+    # Compiled frame-head encoder (see _cencode.pyx); optional.
+    from _cencode import encode_head as _encode_head
+except ImportError:
+    _encode_head = None
+
+
+def _io_uring_available():
+    """True when the liburing binding is importable and the kernel is
+    recent enough (5.19+) for efficient socket sends."""
+    if liburing is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        major, minor = os.uname().release.split('-')[0].split('.')[:2]
+        return (int(major), int(minor)) >= (5, 19)
+    except (ValueError, OSError):
+        return False
+
+
+class _Pipe:
+    """One shared transport per Vector endpoint: socket, queue and worker.
+
+    All :class:`VectorHandler` instances pointing at the same ``(host,
+    port)`` submit to the same pipe, so a process with many sub-loggers
+    keeps one TCP connection and one worker thread per endpoint and their
+    streams merge into larger batches. Transport tuning arguments are taken
+    from whichever handler creates the pipe.
+    """
+
+    def __init__(self, host, port, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_max=DEFAULT_BATCH_MAX,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 spill_path=None, spill_max_bytes=_SPILL_MAX_BYTES,
+                 uds_path=None, use_io_uring=False,
+                 sndbuf_bytes=_SNDBUF_BYTES, tcp_nodelay=True):
+        self.host = host
+        self.port = port
+        self.uds_path = uds_path
+        self.sndbuf_bytes = sndbuf_bytes
+        self.tcp_nodelay = tcp_nodelay
+        self.use_io_uring = use_io_uring and _io_uring_available()
+        self._ring = None
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.dropped = 0
+        self.capacity = queue_size
+        self.closed = False
+        self._refs = 0
+        self._socket = None
+        self._batch_max = batch_max
+        self._flush_interval = flush_interval_ms / 1000.0
+        # Multi-producer/single-consumer pipe without a lock: deque append
+        # and popleft are atomic under the GIL, the Event only wakes the
+        # worker, so producers never contend on a Condition.
+        self.deque = collections.deque()
+        self.wake = threading.Event()
+        self._sending = False
+        self._flush_lock = threading.Lock()
+        # Encoded frames not yet accepted by the kernel; worker-only.
+        self._pending = []
+        self._stalled_at = None
+        self._selector = selectors.DefaultSelector()
+        self._backoff = _BACKOFF_INITIAL
+        self._next_connect = 0.0
+        self._last_error_report = 0.0
+        # Single-entry (second, prefix) cache; only the worker touches it.
+        self._ts_cache = (0, '')
+        # Worker-only: frame bytearrays cycle through the pool once the
+        # kernel has taken their bytes.
+        self._bufpool = []
+        # Specialized context writers keyed by the record's attribute key
+        # set: a generated function once a schema proves hot, False when
+        # the schema cannot be specialized.
+        self._codegen_cache = {}
+        self._keyset_counts = {}
+        self._worker = threading.Thread(
+            target=self._drain_loop,
+            name=f'vector-log-worker-{host}:{port}', daemon=True)
+        self._worker.start()
+
+    def acquire(self):
+        self._refs += 1
+
+    def release(self):
+        self._refs -= 1
+        if self._refs > 0:
+            return False
+        self.closed = True
+        self.wake.set()
+        self._worker.join(timeout=2.0)
+        self._teardown_socket()
+        self._selector.close()
+        return True
+
+    def submit(self, handler, record):
+        if len(self.deque) >= self.capacity:
+            self.dropped += 1
+            return
+        self.deque.append((handler, record))
+        self.wake.set()
+
+    def flush(self):
+        """Block until every queued record has been handed to the socket.
+
+        Group commit for flushers: the first caller in becomes the leader
+        and polls the worker's progress, later callers queue on the lock
+        and return as soon as the leader has observed the drain — their
+        records were enqueued before they called flush, so the leader's
+        completed poll covers them too.
+
+        Bounded by _FLUSH_TIMEOUT: logging.shutdown() calls flush from an
+        atexit hook, and a peer that accepted the connection but stopped
+        reading must not hang interpreter exit (the worker abandons its
+        backlog on the shorter _STALL_TIMEOUT anyway).
+        """
+        deadline = time.monotonic() + _FLUSH_TIMEOUT
+        with self._flush_lock:
+            while (self._worker.is_alive()
+                   and (self.deque or self._sending)
+                   and time.monotonic() < deadline):
+                time.sleep(0.001)
+
+    def _drain_loop(self):
+        while True:
+            if not self.deque and not self._pending:
+                if self.closed:
+                    return
+                self.wake.wait(timeout=self._flush_interval)
+                self.wake.clear()
+                continue
+            self._sending = True
+            if self.deque:
+                batch = []
+                while self.deque and len(batch) < self._batch_max:
+                    batch.append(self.deque.popleft())
+                # Keep the per-record frames separate and let sendmsg
+                # scatter-gather them in one syscall rather than paying for
+                # a big b''.join copy. A record that fails to encode (bad
+                # %-args, unserializable extra) is reported through the
+                # stdlib handleError path and skipped — it must not take
+                # down the worker shared by every handler on this endpoint.
+                for handler, record in batch:
+                    try:
+                        self._pending.append(self._encode(handler, record))
+                    except Exception:
+                        handler.handleError(record)
+            self._flush_pending()
+            if not self._pending:
+                self._sending = False
+
+    def _format_timestamp(self, created):
+        """Format ``record.created`` as UTC ISO-8601 with microseconds.
+
+        The second-resolution prefix is cached so consecutive records within
+        the same second skip strftime and the datetime allocation entirely;
+        only the microsecond tail is computed per record.
+        """
+        sec = int(created)
+        cached_sec, prefix = self._ts_cache
+        if sec != cached_sec:
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+            self._ts_cache = (sec, prefix)
+        return f'{prefix}.{int((created - sec) * 1_000_000):06d}Z'
+
+    def _get_buf(self):
+        return self._bufpool.pop() if self._bufpool else bytearray()
+
+    def _put_buf(self, buf):
+        if len(self._bufpool) < _BUFPOOL_MAX:
+            buf.clear()
+            self._bufpool.append(buf)
+
+    def _encode(self, handler, record):
+        """Serialize one record straight into a pooled bytearray.
+
+        Fields are written in a fixed order with hand-rolled JSON framing,
+        so there is no intermediate entry/context dict and no second pass
+        over the data by a generic encoder. Strings that need no escaping
+        (the overwhelmingly common case) are appended raw; everything else
+        goes through the json/orjson encoder per value.
+        """
+        buf = self._get_buf()
+        if _encode_head is not None:
+            buf += _encode_head(
+                self._format_timestamp(record.created), record.levelname,
+                handler.service_name, record.name, handler.format(record))
+        else:
+            buf += b'{"timestamp":"'
+            buf += self._format_timestamp(record.created).encode('ascii')
+            buf += b'","level":"'
+            buf += record.levelname.encode('ascii')
+            buf += b'","service":'
+            _write_str(buf, handler.service_name)
+            buf += b',"logger":'
+            _write_str(buf, record.name)
+            buf += b',"message":'
+            _write_str(buf, handler.format(record))
+        writer = handler.context_writer
+        if writer is not None:
+            writer(record, buf)
+            buf += b'}\n'
+            return buf
+        keyset = frozenset(record.__dict__)
+        writer = self._codegen_cache.get(keyset)
+        if writer is None:
+            writer = self._note_keyset(keyset)
+        if writer:
+            writer(record, buf)
+        else:
+            ctx_open = False
+            for key, value in record.__dict__.items():
+                if key in _SKIP_ATTRS:
+                    continue
+                buf += b',"context":{' if not ctx_open else b','
+                ctx_open = True
+                _write_str(buf, key)
+                buf += b':'
+                if type(value) is str:
+                    _write_str(buf, value)
+                else:
+                    buf += _dumps(value)
+            if ctx_open:
+                buf += b'}'
+        buf += b'}\n'
+        return buf
+
+    def _note_keyset(self, keyset):
+        """Count how often a record schema shows up and specialize hot ones.
+
+        Services tend to log the same ``extra`` keys over and over; once a
+        key set has been seen _CODEGEN_THRESHOLD times, a context writer is
+        generated for it that reads the attributes directly — no __dict__
+        iteration and no per-key set membership test. Schemas whose keys
+        are not plain identifiers (or are keywords, which would be a
+        syntax error as attribute reads) are pinned to the generic path;
+        schemas arriving once the cache is full take it too, without
+        burning a cache entry. Both side tables are bounded so
+        high-cardinality extras cannot grow them forever: the warmup
+        counts reset past a size cap and pinned-schema sentinels only
+        occupy cache slots up to _CODEGEN_MAX.
+        """
+        counts = self._keyset_counts
+        count = counts.get(keyset, 0) + 1
+        if count < _CODEGEN_THRESHOLD:
+            if keyset not in counts and len(counts) >= _KEYSET_COUNTS_MAX:
+                # Restarting the warmup only delays specialization of
+                # whatever genuinely hot schemas are in flight.
+                counts.clear()
+            counts[keyset] = count
+            return None
+        counts.pop(keyset, None)
+        if len(self._codegen_cache) >= _CODEGEN_MAX:
+            return False
+        extra_keys = sorted(k for k in keyset if k not in _SKIP_ATTRS)
+        if not all(k.isidentifier() and not keyword.iskeyword(k)
+                   for k in extra_keys):
+            self._codegen_cache[keyset] = False
+            return False
+        writer = _specialize_context_writer(extra_keys)
+        self._codegen_cache[keyset] = writer
+        return writer
+
+    def _log_error(self, msg):
+        """Report a transport problem to stderr, rate-limited.
+
+        The pipe must never log through ``logging`` (that would recurse
+        into itself) and must not flood stdout of the very process it is
+        logging for, so failures surface on stderr at most once every few
+        seconds.
+        """
+        now = time.monotonic()
+        if now - self._last_error_report >= _ERROR_REPORT_INTERVAL:
+            self._last_error_report = now
+            print(f'vector-log-hub: {msg}', file=sys.stderr)
+
+    def _ensure_connection(self):
+        """Return the connected socket, reconnecting with backoff.
+
+        Failed attempts schedule the next try exponentially further out
+        (with jitter, capped at a few seconds) instead of sleeping, so the
+        worker keeps draining the queue — spilling or dropping — while the
+        peer is down.
+        """
+        if self._socket is not None:
+            return self._socket
+        now = time.monotonic()
+        if now < self._next_connect:
+            return None
+        sock = None
+        is_unix = False
+        if (self.uds_path and self.host in _LOOPBACK_HOSTS
+                and hasattr(socket, 'AF_UNIX')):
+            # Same-host shipping: a unix stream socket skips the whole
+            # TCP/IP loopback stack. Requires a `mode = "unix"` socket
+            # source on the Vector side.
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(5.0)
+                sock.connect(self.uds_path)
+                is_unix = True
+            except OSError as exc:
+                sock.close()
+                sock = None
+                self._log_error(f'failed to connect to unix socket '
+                                f'{self.uds_path}, falling back to TCP: '
+                                f'{exc}')
+        if sock is None:
+            try:
+                sock = socket.create_connection(
+                    (self.host, self.port), timeout=5.0)
+            except OSError as exc:
+                self._log_error(f'failed to connect to '
+                                f'{self.host}:{self.port}: {exc}')
+                self._next_connect = (now
+                                      + self._backoff * (0.5 + random.random()))
+                self._backoff = min(self._backoff * 2, _BACKOFF_MAX)
+                return None
+        # Default stack tuning masks the batching gains: a bigger send
+        # buffer keeps large batches from blocking on kernel drain and
+        # disabling Nagle stops small tail batches from being delayed.
+        try:
+            if self.sndbuf_bytes:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                self.sndbuf_bytes)
+            if not is_unix:
+                if self.tcp_nodelay:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        except OSError as exc:
+            self._log_error(f'failed to tune socket options: {exc}')
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_WRITE)
+        self._socket = sock
+        self._backoff = _BACKOFF_INITIAL
+        if self.use_io_uring and self._ring is None:
+            try:
+                self._ring = liburing.io_uring()
+                liburing.io_uring_queue_init(2 * self._batch_max, self._ring)
+            except Exception as exc:
+                self._ring = None
+                self.use_io_uring = False
+                self._log_error(f'io_uring setup failed, using sendmsg: '
+                                f'{exc}')
+        self._replay_spill()
+        return sock
+
+    def _abandon_pending(self):
+        """Spill the pending backlog, or drop and count it, then recycle."""
+        if not self._pending:
+            return
+        if not self._spill(self._pending):
+            self.dropped += len(self._pending)
+        for buf in self._pending:
+            if isinstance(buf, bytearray):
+                self._put_buf(buf)
+        self._pending.clear()
+        self._stalled_at = None
+
+    def _teardown_socket(self):
+        self._stalled_at = None
+        if self._ring is not None:
+            try:
+                liburing.io_uring_queue_exit(self._ring)
+            except Exception:
+                pass
+            self._ring = None
+        if self._socket is not None:
+            try:
+                self._selector.unregister(self._socket)
+            except (KeyError, ValueError):
+                pass
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+    def _send_io_uring(self, sock, bufs):
+        """Send the frames as one SQE batch with a single io_uring_enter.
+
+        Each frame becomes a linked send SQE so the stream order is
+        preserved and a *failed* send cancels the rest of the chain.
+        IOSQE_IO_LINK does not break on a short send, though: the truncated
+        completion counts as success and later linked sends still run, so
+        completions after the first short one are excluded from the
+        returned byte count and their frames get resent by the caller —
+        possibly duplicating those frames on the wire, which the NDJSON
+        consumer tolerates far better than frames sliced at the wrong
+        offset. The return value is the contiguous bytes accepted from the
+        front of ``bufs``.
+        """
+        ring = self._ring
+        fd = sock.fileno()
+        queued = 0
+        for buf in bufs:
+            sqe = liburing.io_uring_get_sqe(ring)
+            if sqe is None:
+                break
+            liburing.io_uring_prep_send(sqe, fd, buf, len(buf), 0)
+            sqe.flags |= liburing.IOSQE_IO_LINK
+            queued += 1
+        liburing.io_uring_submit(ring)
+        total = 0
+        blocked = False
+        short = False
+        cqe = liburing.io_uring_cqe()
+        for k in range(queued):
+            liburing.io_uring_wait_cqe(ring, cqe)
+            res = cqe.res
+            liburing.io_uring_cqe_seen(ring, cqe)
+            if res < 0:
+                if res in (-errno.EAGAIN, -errno.ECANCELED):
+                    blocked = True
+                else:
+                    raise OSError(-res, os.strerror(-res))
+            elif not short:
+                total += res
+                if res < len(bufs[k]):
+                    short = True
+        if total == 0 and blocked:
+            raise BlockingIOError(errno.EAGAIN, 'send queue full')
+        return total
+
+    def _spill(self, bufs):
+        """Append encoded frames to the spill file while Vector is down."""
+        if not self.spill_path:
+            return False
+        try:
+            try:
+                size = os.path.getsize(self.spill_path)
+            except FileNotFoundError:
+                size = 0
+            data = b''.join(bufs)
+            if size + len(data) > self.spill_max_bytes:
+                return False
+            with open(self.spill_path, 'ab') as spill:
+                spill.write(data)
+            return True
+        except OSError as exc:
+            self._log_error(f'failed to spill logs to '
+                            f'{self.spill_path}: {exc}')
+            return False
+
+    def _replay_spill(self):
+        """Pull spilled frames back in front of the pending buffer."""
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path, 'rb+') as spill:
+                data = spill.read()
+                spill.seek(0)
+                spill.truncate()
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            self._log_error(f'failed to replay spilled logs from '
+                            f'{self.spill_path}: {exc}')
+            return
+        if data:
+            self._pending.insert(0, data)
+
+    def _flush_pending(self):
+        """Push buffered frames to the socket without blocking the worker.
+
+        When the kernel send buffer fills up, either return to overlap the
+        next batch's encoding with the kernel draining (if the backlog is
+        still small) or park on the selector until the socket is writable.
+        If Vector stalls for good, the pending backlog stops growing, the
+        deque fills and producers shed load through the drop counter.
+        """
+        sock = self._ensure_connection()
+        if sock is None:
+            self._abandon_pending()
+            return
+        bufs = self._pending
+        while bufs:
+            # Hint the kernel to hold the segment when more batched data is
+            # already queued so consecutive batches coalesce.
+            flags = (socket.MSG_MORE
+                     if self.deque and hasattr(socket, 'MSG_MORE') else 0)
+            try:
+                if self._ring is not None:
+                    sent = self._send_io_uring(sock, bufs)
+                elif _HAS_SENDMSG:
+                    sent = sock.sendmsg(bufs[:_IOV_MAX], [], flags)
+                else:
+                    sent = sock.send(bufs[0])
+            except BlockingIOError:
+                # A peer that accepted the connection but stopped reading
+                # wedges the kernel buffer for good: after _STALL_TIMEOUT
+                # without progress, give the backlog to the spill/drop path
+                # like a disconnect, so flush() and interpreter exit are
+                # never held hostage.
+                now = time.monotonic()
+                if self._stalled_at is None:
+                    self._stalled_at = now
+                elif now - self._stalled_at >= _STALL_TIMEOUT:
+                    self._log_error('peer stopped reading; abandoning '
+                                    'buffered logs')
+                    self._teardown_socket()
+                    self._abandon_pending()
+                    return
+                if self.deque and len(bufs) < self._batch_max * 2:
+                    return
+                self._selector.select(timeout=self._flush_interval)
+                continue
+            except OSError as exc:
+                self._log_error(f'failed to send batch to Vector: {exc}')
+                self._teardown_socket()
+                # Keep the frames; the next pass spills or drops them once
+                # the reconnect backoff says so.
+                return
+            self._stalled_at = None
+            i = 0
+            while sent > 0:
+                frame = len(bufs[i])
+                if sent >= frame:
+                    sent -= frame
+                    if isinstance(bufs[i], bytearray):
+                        self._put_buf(bufs[i])
+                    i += 1
+                else:
+                    bufs[i] = bufs[i][sent:]
+                    sent = 0
+            del bufs[:i]
+
+
+_pipes = {}
+_pipes_lock = threading.Lock()
+
+
+def _get_pipe(host, port, **transport_args):
+    key = (host, port)
+    with _pipes_lock:
+        pipe = _pipes.get(key)
+        if pipe is None or pipe.closed:
+            pipe = _Pipe(host, port, **transport_args)
+            _pipes[key] = pipe
+        pipe.acquire()
+        return pipe
+
+
+class VectorHandler(logging.Handler):
+    """Ship log records to a Vector TCP socket source as JSON lines."""
+
+    def __init__(self, host='localhost', port=9000, service_name='unknown',
+                 queue_size=DEFAULT_QUEUE_SIZE, batch_max=DEFAULT_BATCH_MAX,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 spill_path=None, spill_max_bytes=_SPILL_MAX_BYTES,
+                 uds_path=None, use_io_uring=False,
+                 sndbuf_bytes=_SNDBUF_BYTES, tcp_nodelay=True,
+                 context_fields=None):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.service_name = service_name
+        # With a declared context schema the worker skips the __dict__ walk
+        # and the per-schema codegen cache entirely: fields are read with a
+        # fixed guarded writer and absent ones are left out.
+        if context_fields:
+            fields = tuple(context_fields)
+            if not all(field.isidentifier() for field in fields):
+                raise ValueError('context_fields must be identifiers')
+            self.context_writer = _specialize_context_writer(
+                fields, guarded=True)
+        else:
+            self.context_writer = None
+        self._closed = False
+        self._pipe = _get_pipe(
+            host, port, queue_size=queue_size, batch_max=batch_max,
+            flush_interval_ms=flush_interval_ms, spill_path=spill_path,
+            spill_max_bytes=spill_max_bytes, uds_path=uds_path,
+            use_io_uring=use_io_uring, sndbuf_bytes=sndbuf_bytes,
+            tcp_nodelay=tcp_nodelay)
+
+    @property
+    def dropped(self):
+        return self._pipe.dropped
+
+    def handle(self, record):
+        """Like :meth:`logging.Handler.handle` but without the I/O lock.
+
+        ``emit`` only performs atomic deque operations, so there is nothing
+        for producers to serialize on; the pipe worker is the single point
+        that merges all producers' records into one send. Skipping
+        acquire/release removes the last producer-side lock.
+        """
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        """Hand the raw record to the shared endpoint pipe.
+
+        The producer path is a bounds check plus a deque append; formatting,
+        context extraction, JSON encoding and the socket write all run on
+        the pipe's worker. On queue overflow the record is dropped and
+        counted rather than blocking the application. Records below the
+        handler level (or sampled out via ``extra={'sample_rate': ...}``)
+        return before anything allocates.
+        """
+        if record.levelno < self.level:
+            return
+        try:
+            rate = record.__dict__.get('sample_rate')
+            if rate is not None and rate < 1.0:
+                # Deterministic sub-sampling off the record's own clock, so
+                # high-volume call sites can opt into keeping every Nth line
+                # without coordinating state across threads.
+                if int(record.created * 1_000_000) % 1000 >= rate * 1000:
+                    return
+            self._pipe.submit(self, record)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Block until every queued record has been handed to the socket."""
+        self._pipe.flush()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            with _pipes_lock:
+                if self._pipe.release():
+                    _pipes.pop((self.host, self.port), None)
+        super().close()
+
+
+def setup_logging(service_name, host='localhost', port=9000,
+                  level=logging.INFO,
+                  flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                  uds_path=None):
+    """Attach a :class:`VectorHandler` to the root logger and return it.
+
+    When ``uds_path`` is set and ``host`` is a loopback address, logs go
+    over a unix domain socket instead of TCP (configure a ``mode = "unix"``
+    socket source in Vector); connection failures fall back to TCP.
+    """
+    handler = VectorHandler(host=host, port=port, service_name=service_name,
+                            flush_interval_ms=flush_interval_ms,
+                            uds_path=uds_path)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    return handler
@@ -0,0 +1,361 @@
+"""Tests for the Vector logging handler.
+
+The whole class shares one in-process TCP sink standing in for the Vector
+socket source and one handler (hence one pipe/connection), mirroring how a
+long-lived service uses the handler. Individual tests mark their position
+in the received byte stream and assert on the JSON lines that arrive after
+it, woken by the drain thread instead of polling.
+"""
+
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import handler
+from handler import VectorHandler, setup_logging
+
+
+class VectorLoggingTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.received = bytearray()
+        cls.cond = threading.Condition()
+        cls.sink = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        cls.sink.bind(('127.0.0.1', 0))
+        cls.sink.listen(1)
+        cls.port = cls.sink.getsockname()[1]
+        threading.Thread(target=cls._drain_sink, daemon=True).start()
+        logging.getLogger().handlers.clear()
+        cls.handler = setup_logging('test-service', '127.0.0.1', cls.port)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.getLogger().removeHandler(cls.handler)
+        cls.handler.close()
+        cls.sink.close()
+
+    @classmethod
+    def _drain_sink(cls):
+        try:
+            conn, _ = cls.sink.accept()
+        except OSError:
+            return
+        with conn:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    return
+                with cls.cond:
+                    cls.received.extend(chunk)
+                    cls.cond.notify_all()
+
+    def setUp(self):
+        # Drop any handlers a test may have attached (closing them releases
+        # their sockets) and keep only the shared one.
+        root = logging.getLogger()
+        for handler in root.handlers:
+            if handler is not self.handler:
+                handler.close()
+        root.handlers.clear()
+        root.addHandler(self.handler)
+        self._mark = len(self.received)
+
+    def _lines_since_mark(self):
+        data = bytes(self.received[self._mark:])
+        return [json.loads(line)
+                for line in data.decode('utf-8').splitlines() if line]
+
+    def _wait_for_lines(self, count, timeout=5.0):
+        self.handler.flush()
+        with self.cond:
+            ok = self.cond.wait_for(
+                lambda: len(self._lines_since_mark()) >= count, timeout)
+        lines = self._lines_since_mark()
+        if not ok:
+            self.fail(f'expected {count} log lines, got {len(lines)}')
+        return lines
+
+    def test_basic_logging(self):
+        logging.getLogger('test').info('hello vector')
+        entry = self._wait_for_lines(1)[0]
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['service'], 'test-service')
+        self.assertEqual(entry['logger'], 'test')
+        self.assertEqual(entry['message'], 'hello vector')
+        self.assertIn('timestamp', entry)
+
+    def test_extra_context(self):
+        logging.getLogger('test').info(
+            'operation finished',
+            extra={'operation_id': 'op-42', 'duration_ms': 12})
+        entry = self._wait_for_lines(1)[0]
+        self.assertEqual(entry['context']['operation_id'], 'op-42')
+        self.assertEqual(entry['context']['duration_ms'], 12)
+
+    def test_rapid_logging(self):
+        logger = logging.getLogger('test.rapid')
+        count = 500
+        for i in range(count):
+            logger.info('rapid message %d', i)
+        lines = self._wait_for_lines(count)
+        self.assertEqual(len(lines), count)
+        self.assertEqual(lines[0]['message'], 'rapid message 0')
+        self.assertEqual(lines[-1]['message'], f'rapid message {count - 1}')
+        self.assertEqual(self.handler.dropped, 0)
+
+    def test_bad_record_does_not_kill_worker(self):
+        # A record whose %-args blow up in format() is reported via
+        # handleError and skipped; the shared worker must keep shipping.
+        logger = logging.getLogger('test.bad')
+        raise_exceptions = logging.raiseExceptions
+        logging.raiseExceptions = False
+        try:
+            logger.info('%d', 'not-an-int')
+            logger.info('still alive')
+            lines = self._wait_for_lines(1)
+        finally:
+            logging.raiseExceptions = raise_exceptions
+        self.assertEqual(lines[-1]['message'], 'still alive')
+
+    def test_keyword_extra_keys_stay_generic(self):
+        # 'from' passes isidentifier() but cannot be specialized into an
+        # attribute read; the schema must keep flowing via the generic path
+        # even after it becomes hot.
+        logger = logging.getLogger('test.kw')
+        for i in range(20):
+            logger.info('kw %d', i, extra={'from': f'svc-{i}'})
+        lines = self._wait_for_lines(20)
+        self.assertEqual([entry['context']['from'] for entry in lines],
+                         [f'svc-{i}' for i in range(20)])
+
+    def test_sample_rate_subsamples(self):
+        # extra={'sample_rate': r} keeps roughly r of the records and the
+        # key itself never ships as context; a trailing unsampled marker
+        # bounds the wait without knowing how many survived.
+        logger = logging.getLogger('test.sample')
+        count = 500
+        for i in range(count):
+            logger.info('sampled %d', i, extra={'sample_rate': 0.2})
+        logger.info('sampling done')
+        self.handler.flush()
+        with self.cond:
+            ok = self.cond.wait_for(
+                lambda: any(e['message'] == 'sampling done'
+                            for e in self._lines_since_mark()), 5.0)
+        self.assertTrue(ok, 'marker record never arrived')
+        sampled = [e for e in self._lines_since_mark()
+                   if e['message'].startswith('sampled ')]
+        self.assertLess(len(sampled), count)
+        for entry in sampled:
+            self.assertNotIn('sample_rate', entry.get('context', {}))
+
+    def test_context_fields_declared_schema(self):
+        # A declared schema ships exactly the declared fields: undeclared
+        # extras are dropped, absent fields are skipped, and a record with
+        # none of them carries no context object at all.
+        vh = VectorHandler('127.0.0.1', self.port, 'schema-svc',
+                           context_fields=('operation_id', 'duration_ms'))
+        vh.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('test.schema')
+        logger.handlers = [vh]
+        logger.propagate = False
+        try:
+            logger.info('declared', extra={'operation_id': 'op-7',
+                                           'duration_ms': 3,
+                                           'undeclared': 'dropped'})
+            logger.info('partial', extra={'duration_ms': 9})
+            logger.info('bare')
+            lines = self._wait_for_lines(3)
+        finally:
+            logger.handlers = []
+            vh.close()
+        declared, partial, bare = lines
+        self.assertEqual(declared['context'],
+                         {'operation_id': 'op-7', 'duration_ms': 3})
+        self.assertEqual(partial['context'], {'duration_ms': 9})
+        self.assertNotIn('context', bare)
+
+    def test_context_fields_rejects_non_identifiers(self):
+        with self.assertRaises(ValueError):
+            VectorHandler('127.0.0.1', self.port, 'schema-svc',
+                          context_fields=('ok', 'not-an-identifier'))
+
+    def test_batching_preserves_framing(self):
+        # Records pushed back-to-back ride the same batch; every received
+        # line must still be a standalone JSON document.
+        logger = logging.getLogger('test.batch')
+        for i in range(50):
+            logger.info('framed %d', i, extra={'seq': i})
+        lines = self._wait_for_lines(50)
+        self.assertEqual([entry['context']['seq'] for entry in lines],
+                         list(range(50)))
+
+
+class SpillTest(unittest.TestCase):
+    """Spill-and-replay across an endpoint outage; per-test sinks."""
+
+    def setUp(self):
+        self.spill_path = tempfile.mktemp(prefix='vector-spill-')
+
+    def tearDown(self):
+        try:
+            os.unlink(self.spill_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _reserve_port():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    @staticmethod
+    def _make_logger(name, vh):
+        vh.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger(name)
+        logger.handlers = [vh]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        return logger
+
+    def test_spill_and_replay_ordering(self):
+        # While the endpoint is down, records land in the spill file; on
+        # reconnect the file is replayed ahead of fresh records and
+        # truncated, so nothing is shipped twice or out of order.
+        port = self._reserve_port()
+        vh = VectorHandler('127.0.0.1', port, 'spill-svc',
+                           spill_path=self.spill_path, flush_interval_ms=1)
+        logger = self._make_logger('test.spill', vh)
+        received = bytearray()
+        cond = threading.Condition()
+        sink = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            for i in range(5):
+                logger.info('spilled %d', i)
+            deadline = time.monotonic() + 5.0
+            while time.monotonic() < deadline:
+                try:
+                    if os.path.getsize(self.spill_path) > 0:
+                        break
+                except FileNotFoundError:
+                    pass
+                time.sleep(0.01)
+            else:
+                self.fail('records never reached the spill file')
+
+            sink.bind(('127.0.0.1', port))
+            sink.listen(1)
+
+            def drain():
+                conn, _ = sink.accept()
+                with conn:
+                    while True:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            return
+                        with cond:
+                            received.extend(chunk)
+                            cond.notify_all()
+
+            threading.Thread(target=drain, daemon=True).start()
+
+            def messages():
+                return [json.loads(line)['message'] for line
+                        in bytes(received).decode().splitlines() if line]
+
+            # Reconnects only happen when the worker has work, so keep
+            # feeding fresh records until the backoff expires and the
+            # replayed stream shows up at the sink.
+            deadline = time.monotonic() + 10.0
+            seq = 0
+            while time.monotonic() < deadline:
+                logger.info('fresh %d', seq)
+                seq += 1
+                with cond:
+                    if cond.wait_for(
+                            lambda: any(m.startswith('fresh')
+                                        for m in messages()), 0.05):
+                        break
+            else:
+                self.fail('sink never saw the reconnected stream')
+            got = messages()
+            self.assertEqual(got[:5], [f'spilled {i}' for i in range(5)])
+            self.assertEqual(os.path.getsize(self.spill_path), 0)
+        finally:
+            logger.handlers = []
+            vh.close()
+            sink.close()
+
+    def test_spill_size_cap_drops_and_counts(self):
+        # Once the file would exceed spill_max_bytes the frames are dropped
+        # and counted instead of growing the spill without bound.
+        port = self._reserve_port()
+        vh = VectorHandler('127.0.0.1', port, 'spill-svc',
+                           spill_path=self.spill_path, spill_max_bytes=64,
+                           flush_interval_ms=1)
+        logger = self._make_logger('test.spillcap', vh)
+        try:
+            payload = 'x' * 256
+            for i in range(5):
+                logger.info(payload)
+            deadline = time.monotonic() + 5.0
+            while time.monotonic() < deadline and vh.dropped < 5:
+                time.sleep(0.01)
+            self.assertGreaterEqual(vh.dropped, 5)
+            if os.path.exists(self.spill_path):
+                self.assertLessEqual(os.path.getsize(self.spill_path), 64)
+        finally:
+            logger.handlers = []
+            vh.close()
+
+
+class StalledPeerTest(unittest.TestCase):
+
+    def test_flush_returns_when_peer_stops_reading(self):
+        # The sink accepts the connection but never reads, so the kernel
+        # buffers wedge; flush() must still return (logging.shutdown runs
+        # it at interpreter exit) once the worker abandons its backlog.
+        sink = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Clamp the receive window so loopback cannot absorb the backlog.
+        sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8192)
+        sink.bind(('127.0.0.1', 0))
+        sink.listen(1)
+        conn_holder = []
+        threading.Thread(target=lambda: conn_holder.append(sink.accept()),
+                         daemon=True).start()
+        stall_timeout = handler._STALL_TIMEOUT
+        handler._STALL_TIMEOUT = 0.2
+        vh = VectorHandler('127.0.0.1', sink.getsockname()[1], 'stall-svc',
+                           sndbuf_bytes=8192, flush_interval_ms=1)
+        vh.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('test.stall')
+        logger.handlers = [vh]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            payload = 'x' * 8192
+            for _ in range(500):
+                logger.info(payload)
+            start = time.monotonic()
+            vh.flush()
+            self.assertLess(time.monotonic() - start, 5.0)
+            self.assertGreater(vh.dropped, 0)
+        finally:
+            handler._STALL_TIMEOUT = stall_timeout
+            logger.handlers = []
+            vh.close()
+            for conn, _ in conn_holder:
+                conn.close()
+            sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()